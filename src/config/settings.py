@@ -9,11 +9,20 @@ MODEL_PATH = str(PROJECT_ROOT / "models" / "best.pt")  # Absolute path to model
 CONFIDENCE_THRESHOLD = 0.5
 IMG_SIZE = 640
 
+# TensorRT engine, exported from MODEL_PATH on first run when a GPU is available
+USE_TENSORRT = True
+ENGINE_PATH = str(PROJECT_ROOT / "models" / "best.engine")
+TENSORRT_INT8 = False  # FP16 by default; INT8 needs the calibration dataset below
+CALIB_DATA = str(PROJECT_ROOT / "models" / "calib.yaml")  # Representative site images
+
 # Processing Configuration
 TARGET_FPS = 24
 TARGET_WIDTH = 1280
 TARGET_HEIGHT = 720
 IOU_THRESHOLD = 0
+BATCH_SIZE = 16  # Video frames per YOLO inference call
+FRAME_SKIP_HAMMING = 8  # Reuse detections when fewer of the 256 frame-hash bits change (0 disables)
+MAX_SKIPPED_FRAMES = 5  # Force inference after this many consecutive reused frames
 
 # PPE Weightage (must sum to 100%)
 PPE_WEIGHTS = {
@@ -28,6 +37,7 @@ OUTPUT_DIR = str(PROJECT_ROOT / "outputs")
 LOG_DIR = str(PROJECT_ROOT / "outputs" / "logs")
 
 # Visualization
+USE_OPENCL = False  # OpenCL (UMat) resize; costs an upload and a download per frame, so opt-in
 COLORS = {
     'Person': (0, 0, 255),        # Red
     'Hardhat': (0, 255, 0),       # Green
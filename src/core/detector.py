@@ -1,20 +1,49 @@
 import cv2
 import os
 import time
+import heapq
 import logging
-from collections import defaultdict
+import numpy as np
+import torch
+from logging.handlers import RotatingFileHandler
+from scipy.optimize import linear_sum_assignment
 from ultralytics import YOLO
 from ..config.settings import (
     MODEL_PATH, CONFIDENCE_THRESHOLD, IMG_SIZE,
     TARGET_WIDTH, TARGET_HEIGHT, IOU_THRESHOLD,
-    PPE_WEIGHTS , LOG_DIR
+    PPE_WEIGHTS , LOG_DIR, BATCH_SIZE,
+    USE_TENSORRT, ENGINE_PATH, TENSORRT_INT8, CALIB_DATA,
+    FRAME_SKIP_HAMMING, MAX_SKIPPED_FRAMES
 )
 
+# Configured once at import; re-imports and extra detectors reuse the handler
+os.makedirs(LOG_DIR, exist_ok=True)
+logger = logging.getLogger('ppe')
+if not logger.handlers:
+    _handler = RotatingFileHandler(
+        os.path.join(LOG_DIR, 'ppe_detection.log'),
+        maxBytes=5 * 1024 * 1024,
+        backupCount=3
+    )
+    _handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def frame_hash(frame):
+    """256-bit average hash of a 16x16 grayscale thumbnail, as four uint64 lanes"""
+    thumb = cv2.resize(frame, (16, 16), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    return np.packbits(gray > np.median(gray)).view(np.uint64)
+
+def hamming(hash1, hash2):
+    """Number of differing bits between two frame hashes"""
+    return sum(bin(lane).count('1') for lane in (hash1 ^ hash2).tolist())
+
 class PPEDetector:
     def __init__(self):
-         # Add these debug statements right at the start of the __init__ method
-        print(f"Attempting to load model from: {MODEL_PATH}")
-        print(f"File exists: {os.path.exists(MODEL_PATH)}")
+        self.logger = logger
+        self.logger.debug(f"Attempting to load model from: {MODEL_PATH}")
         
         # Add the validation check before loading the model
         if not os.path.exists(MODEL_PATH):
@@ -26,169 +55,249 @@ class PPEDetector:
                 f"2. You have proper read permissions\n"
                 f"3. The path is correctly specified in src/config/settings.py"
             )
-        self.model = YOLO(MODEL_PATH)
-        self.logger = self.setup_logging()
-        self.id_counter = 0
-        self.tracked_persons = {}
-        
-    def setup_logging(self):
-        os.makedirs(LOG_DIR, exist_ok=True)
-        logging.basicConfig(
-            filename=os.path.join(LOG_DIR, 'ppe_detection.log'),
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s'
+        self.model = self.load_model()
+        # PPE weight per model class id, 0 for non-PPE classes
+        self.class_weights = np.array(
+            [PPE_WEIGHTS.get(self.model.names[c], 0) for c in range(len(self.model.names))],
+            dtype=np.float32
         )
-        return logging.getLogger()
-    
-    def calculate_iou(self, box1, box2):
-        """Calculate Intersection over Union (IoU) between two boxes"""
-        # Calculate intersection area
-        x1 = max(box1[0], box2[0])
-        y1 = max(box1[1], box2[1])
-        x2 = min(box1[2], box2[2])
-        y2 = min(box1[3], box2[3])
-        
-        if x2 < x1 or y2 < y1:
-            return 0.0
-        
-        intersection = (x2 - x1) * (y2 - y1)
-        area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union = area1 + area2 - intersection
-        
-        return intersection / union
-    
-    def assign_ppe_to_persons(self, persons, ppe_items):
-        assigned_ppe = defaultdict(list)
-        
-        # Sort PPE items by size (largest first) to prioritize vests/helmets
-        ppe_items_sorted = sorted(
-            ppe_items,
-            key=lambda x: (x['box'][2]-x['box'][0])*(x['box'][3]-x['box'][1]),
-            reverse=True
+        # Class ids used to split detections (-1 never matches)
+        self.person_class_id = next(
+            (c for c, name in self.model.names.items() if name == 'Person'), -1
+        )
+        self.ppe_class_ids = np.array(
+            [c for c, name in self.model.names.items() if name in PPE_WEIGHTS], dtype=int
         )
+        self.id_counter = 0
+        self.tracked_persons = {}  # Track ID -> last seen (monotonic seconds)
+        # Track IDs and their last centers, row-aligned
+        self.tracked_ids = []
+        self.tracked_centers = np.empty((0, 2))
+        # (last seen, track ID) min-heap for expiring tracks
+        self._track_heap = []
+        # Hash of the last frame sent to the model and the latest result
+        self.reset()
         
-        for ppe in ppe_items_sorted:
-            best_iou = 0
-            best_person = None
-            
-            for person in persons:
-                current_iou = self.calculate_iou(person['box'], ppe['box'])
-                if current_iou > best_iou and current_iou >= IOU_THRESHOLD:
-                    best_iou = current_iou
-                    best_person = person
+    def load_model(self):
+        """Load the TensorRT engine if possible, falling back to the PyTorch weights"""
+        if not (USE_TENSORRT and torch.cuda.is_available()):
+            return YOLO(MODEL_PATH)
+        
+        try:
+            # Rebuild when the weights were replaced or retrained after the export
+            if (not os.path.exists(ENGINE_PATH)
+                    or os.path.getmtime(MODEL_PATH) > os.path.getmtime(ENGINE_PATH)):
+                self.export_engine()
             
-            if best_person is not None:
-                assigned_ppe[best_person['id']].append(ppe)
+            model = YOLO(ENGINE_PATH, task='detect')
+            # The engine backend loads lazily; surface GPU/TensorRT mismatches here
+            model(np.zeros((IMG_SIZE, IMG_SIZE, 3), dtype=np.uint8), imgsz=IMG_SIZE, verbose=False)
+            return model
+        except Exception as e:
+            self.logger.warning(f"TensorRT engine unavailable, using PyTorch model: {str(e)}")
+            return YOLO(MODEL_PATH)
+    
+    def export_engine(self):
+        export_args = dict(
+            format='engine', half=True, imgsz=IMG_SIZE,
+            dynamic=True, batch=BATCH_SIZE
+        )
+        if TENSORRT_INT8:
+            export_args.update(int8=True, data=CALIB_DATA)
+        
+        # The export goes through ONNX; remove that intermediate unless it was already there
+        onnx_path = os.path.splitext(MODEL_PATH)[0] + '.onnx'
+        keep_onnx = os.path.exists(onnx_path)
+        
+        self.logger.info(f"Exporting TensorRT engine to {ENGINE_PATH}")
+        exported = YOLO(MODEL_PATH).export(**export_args)
+        if os.path.abspath(exported) != os.path.abspath(ENGINE_PATH):
+            os.replace(exported, ENGINE_PATH)
         
-        return assigned_ppe
+        if not keep_onnx and os.path.exists(onnx_path):
+            os.remove(onnx_path)
     
-    def calculate_ppe_scores(self, persons, assigned_ppe):
-        scores = {}
-        for person in persons:
-            pid = person['id']
-            score = 0
-            
-            # Calculate base score from detected items
-            if pid in assigned_ppe:
-                for ppe in assigned_ppe[pid]:
-                    score += PPE_WEIGHTS.get(ppe['class'], 0)
-            
-            # Enforce 100% cap and minimum 0%
-            scores[pid] = max(0, min(100, score))
-            
-            # Debug output
-            print(f"Person {pid} PPE Items: {[item['class'] for item in assigned_ppe.get(pid, [])]}")
-            print(f"Raw Score: {score} -> Final Score: {scores[pid]}%")
+    def assign_ppe_to_persons(self, person_boxes, ppe_boxes):
+        """Return the (persons x PPE items) assignment matrix, one owner per item"""
+        assigned = np.zeros((len(person_boxes), len(ppe_boxes)), dtype=np.float32)
+        if not len(person_boxes) or not len(ppe_boxes):
+            return assigned
+        
+        pb, qb = person_boxes, ppe_boxes  # (N, 4), (M, 4)
+        
+        # Full (N persons x M PPE) IoU matrix in one broadcasted pass
+        tl = np.maximum(pb[:, None, :2], qb[None, :, :2])
+        br = np.minimum(pb[:, None, 2:], qb[None, :, 2:])
+        wh = np.clip(br - tl, 0, None)
+        inter = wh[..., 0] * wh[..., 1]
+        area_p = (pb[:, 2] - pb[:, 0]) * (pb[:, 3] - pb[:, 1])
+        area_q = (qb[:, 2] - qb[:, 0]) * (qb[:, 3] - qb[:, 1])
+        union = area_p[:, None] + area_q[None, :] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        
+        # Best person for every PPE item (first person wins ties)
+        items = np.arange(len(ppe_boxes))
+        best_person = iou.argmax(axis=0)
+        best_iou = iou[best_person, items]
+        matched = (best_iou > 0) & (best_iou >= IOU_THRESHOLD)
+        assigned[best_person[matched], items[matched]] = 1
+        
+        return assigned
+    
+    def calculate_ppe_scores(self, person_ids, ppe_classes, assigned):
+        """Return PPE scores (0-100) row-aligned with person_ids"""
+        # Weighted sum of each person's assigned items in a single matmul
+        raw_scores = assigned @ self.class_weights[ppe_classes]
+        
+        # Enforce 100% cap and minimum 0%
+        scores = np.clip(raw_scores, 0, 100).astype(int)
+        
+        # Stripped entirely under python -O
+        if __debug__ and self.logger.isEnabledFor(logging.DEBUG):
+            for i, pid in enumerate(person_ids):
+                items = [self.model.names[ppe_classes[j]] for j in np.flatnonzero(assigned[i])]
+                self.logger.debug(
+                    f"Person {pid} PPE Items: {items} "
+                    f"Raw Score: {raw_scores[i]:.0f} -> Final Score: {scores[i]}%"
+                )
         
         return scores
 
-    def track_persons(self, current_persons):
-        """Track persons across frames with ID persistence"""
-        updated_persons = []
-        
-        for person in current_persons:
-            # Simple tracking based on box center proximity
-            cx = (person['box'][0] + person['box'][2]) / 2
-            cy = (person['box'][1] + person['box'][3]) / 2
-            
-            matched_id = None
-            min_distance = float('inf')
-            
-            for pid, data in self.tracked_persons.items():
-                prev_cx, prev_cy = data['center']
-                distance = ((cx - prev_cx)**2 + (cy - prev_cy)**2)**0.5
-                
-                if distance < 50 and distance < min_distance:  # 50 pixel threshold
-                    min_distance = distance
-                    matched_id = pid
-            
-            if matched_id is not None:
-                person['id'] = matched_id
+    def track_persons(self, person_boxes):
+        """Track persons across frames with ID persistence, returning their IDs"""
+        current_time = time.monotonic()
+        curr = (person_boxes[:, :2] + person_boxes[:, 2:]) / 2
+        
+        # Optimal one-to-one matching on box center distance
+        matches = {}
+        if len(curr) and len(self.tracked_ids):
+            cost = np.linalg.norm(curr[:, None, :] - self.tracked_centers[None, :, :], axis=2)
+            cost[cost >= 50] = 1e6  # 50 pixel threshold
+            rows, cols = linear_sum_assignment(cost)
+            matches = {r: c for r, c in zip(rows, cols) if cost[r, c] < 1e6}
+        
+        person_ids = np.empty(len(curr), dtype=int)
+        new_rows = []
+        for i in range(len(curr)):
+            if i in matches:
                 # Update tracker with new position
-                self.tracked_persons[matched_id] = {
-                    'center': (cx, cy),
-                    'timestamp': time.time()
-                }
+                col = matches[i]
+                pid = self.tracked_ids[col]
+                self.tracked_centers[col] = curr[i]
             else:
                 # New person
                 self.id_counter += 1
-                person['id'] = self.id_counter
-                self.tracked_persons[self.id_counter] = {
-                    'center': (cx, cy),
-                    'timestamp': time.time()
-                }
-            
-            updated_persons.append(person)
+                pid = self.id_counter
+                self.tracked_ids.append(pid)
+                new_rows.append(i)
+            person_ids[i] = pid
+            self.tracked_persons[pid] = current_time
+            heapq.heappush(self._track_heap, (current_time, pid))
         
-        # Clean up old tracks (people who left the frame)
-        current_time = time.time()
-        self.tracked_persons = {
-            pid: data for pid, data in self.tracked_persons.items()
-            if current_time - data['timestamp'] < 2.0  # 2 second timeout
-        }
+        if new_rows:
+            self.tracked_centers = np.vstack([self.tracked_centers, curr[new_rows]])
+        
+        # Clean up old tracks (people who left the frame), oldest first
+        expired = []
+        while self._track_heap and current_time - self._track_heap[0][0] >= 2.0:  # 2 second timeout
+            timestamp, pid = heapq.heappop(self._track_heap)
+            # Entries superseded by a newer sighting, or already expired, are skipped
+            if self.tracked_persons.get(pid) == timestamp:
+                del self.tracked_persons[pid]
+                expired.append(pid)
+        if expired:
+            keep = np.isin(self.tracked_ids, expired, invert=True)
+            self.tracked_ids = [pid for pid, alive in zip(self.tracked_ids, keep) if alive]
+            self.tracked_centers = self.tracked_centers[keep]
         
-        return updated_persons
+        return person_ids
+    
+    def reset(self):
+        """Forget cached detections, e.g. before starting a new input"""
+        self._last_hash = None
+        self._last_result = None
+        self._skipped_frames = 0
     
     def process_frame(self, frame):
         """Process a single frame and return results"""
+        return self.process_frames([frame])[0]
+    
+    def process_frames(self, frames):
+        """Process a batch of frames with one YOLO call, returning results in order"""
         try:
-            # Resize to target resolution
-            frame = cv2.resize(frame, (TARGET_WIDTH, TARGET_HEIGHT))
-            
-            # Run YOLO inference
-            results = self.model(frame, imgsz=IMG_SIZE, conf=CONFIDENCE_THRESHOLD)
-            
-            # Convert detections to readable format
-            detections = []
-            for result in results:
-                for box, cls, conf in zip(result.boxes.xyxy, result.boxes.cls, result.boxes.conf):
-                    detections.append({
-                        'class': self.model.names[int(cls)],
-                        'box': box.tolist(),
-                        'confidence': float(conf)
-                    })
+            # Only frames that differ from the last inferred one need the model
+            run = []
+            for frame in frames:
+                curr_hash = frame_hash(frame)
+                changed = (self._last_hash is None
+                           or self._skipped_frames >= MAX_SKIPPED_FRAMES
+                           or hamming(self._last_hash, curr_hash) >= FRAME_SKIP_HAMMING)
+                if changed:
+                    self._last_hash = curr_hash
+                    self._skipped_frames = 0
+                else:
+                    self._skipped_frames += 1
+                run.append(changed)
             
-            # Separate persons and PPE items
-            persons = [d for d in detections if d['class'] == 'Person']
-            ppe_items = [d for d in detections if d['class'] in PPE_WEIGHTS]
+            # Run batched YOLO inference; its letterbox does the only resize
+            inputs = [frame for frame, changed in zip(frames, run) if changed]
+            results = iter(self.model(inputs, imgsz=IMG_SIZE, conf=CONFIDENCE_THRESHOLD) if inputs else [])
             
-            # Track persons across frames
-            tracked_persons = self.track_persons(persons)
-            
-            # Assign PPE items to persons
-            assigned_ppe = self.assign_ppe_to_persons(tracked_persons, ppe_items)
-            
-            # Calculate PPE scores
-            scores = self.calculate_ppe_scores(tracked_persons, assigned_ppe)
-            
-            return {
-                'frame': frame,
-                'persons': tracked_persons,
-                'ppe_items': ppe_items,
-                'scores': scores
-            }
+            # Tracking is stateful, so post-process strictly in frame order
+            processed = []
+            for frame, changed in zip(frames, run):
+                if changed:
+                    self._last_result = self._build_frame_data(frame, next(results))
+                else:
+                    self._last_result = self._reuse_frame_data(frame)
+                processed.append(self._last_result)
+            return processed
             
         except Exception as e:
             self.logger.error(f"Error processing frame: {str(e)}")
-            raise
\ No newline at end of file
+            raise
+    
+    def _reuse_frame_data(self, frame):
+        """Repeat the latest detections for a near-identical frame"""
+        frame_data = dict(self._last_result, frame=frame)
+        # Keep the cached tracks alive
+        self.track_persons(frame_data['person_boxes'])
+        return frame_data
+    
+    def _build_frame_data(self, frame, result):
+        """Turn one YOLO result into tracked persons, PPE items and scores"""
+        # Bulk-convert detections once (struct of arrays)
+        boxes = result.boxes.xyxy.cpu().numpy()
+        classes = result.boxes.cls.cpu().numpy().astype(int)
+        confidences = result.boxes.conf.cpu().numpy()
+        
+        # Boxes come back in source pixels; map them to target resolution
+        height, width = result.orig_shape
+        boxes *= np.array([TARGET_WIDTH / width, TARGET_HEIGHT / height] * 2, dtype=boxes.dtype)
+        
+        # Separate persons and PPE items with class-id masks
+        person_mask = classes == self.person_class_id
+        ppe_mask = np.isin(classes, self.ppe_class_ids)
+        person_boxes = boxes[person_mask]
+        ppe_boxes = boxes[ppe_mask]
+        ppe_classes = classes[ppe_mask]
+        
+        # Track persons across frames
+        person_ids = self.track_persons(person_boxes)
+        
+        # Assign PPE items to persons
+        assigned_ppe = self.assign_ppe_to_persons(person_boxes, ppe_boxes)
+        
+        # Calculate PPE scores
+        scores = self.calculate_ppe_scores(person_ids, ppe_classes, assigned_ppe)
+        
+        return {
+            'frame': frame,
+            'names': self.model.names,
+            'person_boxes': person_boxes,
+            'person_ids': person_ids,
+            'scores': scores,
+            'ppe_boxes': ppe_boxes,
+            'ppe_classes': ppe_classes,
+            'ppe_confidences': confidences[ppe_mask]
+        }
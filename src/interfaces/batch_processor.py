@@ -1,55 +1,115 @@
 import os
 import cv2
 import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from src.core.detector import PPEDetector
+from src.utils.visualization import Visualizer
 from ..config.settings import (
-    TARGET_WIDTH, TARGET_HEIGHT,OUTPUT_DIR,SOURCE_DIR,COLORS,COMPLIANCE_THRESHOLD
+    TARGET_WIDTH, TARGET_HEIGHT,OUTPUT_DIR,SOURCE_DIR,
+    BATCH_SIZE
 )
 
+try:
+    import decord
+except ImportError:
+    decord = None  # Optional GPU video decoding
 
-def process_and_save(detector, input_path, output_path):
+
+def open_video(input_path):
+    """Open a video for batched reading, returning (fps, frame batches) or None
+    
+    Decodes on the GPU (NVDEC) through decord when it is installed with
+    CUDA support, otherwise falls back to OpenCV.
+    """
+    if decord is not None:
+        try:
+            reader = decord.VideoReader(input_path, ctx=decord.gpu(0))
+            return reader.get_avg_fps(), decord_batches(reader)
+        except Exception:
+            pass  # CPU-only decord build or unsupported stream
+    
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        return None
+    return cap.get(cv2.CAP_PROP_FPS), capture_batches(cap)
+
+def decord_batches(reader):
+    """Yield lists of up to BATCH_SIZE BGR frames decoded by decord"""
+    for start in range(0, len(reader), BATCH_SIZE):
+        indices = list(range(start, min(start + BATCH_SIZE, len(reader))))
+        # One device-to-host copy per batch; decord returns RGB
+        batch = reader.get_batch(indices).asnumpy()
+        yield list(np.ascontiguousarray(batch[..., ::-1]))
+
+def capture_batches(cap):
+    """Yield lists of up to BATCH_SIZE frames read with OpenCV"""
+    pending = []
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            
+            pending.append(frame)
+            if len(pending) == BATCH_SIZE:
+                yield pending
+                pending = []
+        
+        if pending:
+            yield pending
+    finally:
+        cap.release()
+
+def create_writer(output_path, fps):
+    """Open an H.264 writer, hardware-encoded (e.g. NVENC) when FFmpeg supports it"""
+    size = (TARGET_WIDTH, TARGET_HEIGHT)
+    out = cv2.VideoWriter(
+        output_path,
+        cv2.CAP_FFMPEG,
+        cv2.VideoWriter_fourcc(*'avc1'),
+        fps,
+        size,
+        [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+    )
+    if not out.isOpened():
+        # OpenCV build without an H.264 encoder
+        out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    return out
+
+def process_and_save(detector, visualizer, input_path, output_path):
     """Process an input file and save results"""
+    # Detections cached for frame skipping belong to the previous file
+    detector.reset()
+    
     if input_path.lower().endswith(('.jpg', '.jpeg', '.png')):
         # Image processing
         img = cv2.imread(input_path)
         if img is not None:
             frame_data = detector.process_frame(img)
-            visualized = visualize_results(frame_data)
+            visualized = visualizer.visualize_results(frame_data)
             cv2.imwrite(output_path, visualized)
             return True
         return False
     
     elif input_path.lower().endswith(('.mp4', '.avi', '.mov')):
         # Video processing
-        cap = cv2.VideoCapture(input_path)
-        if not cap.isOpened():
+        video = open_video(input_path)
+        if video is None:
             return False
-        
-        # Get video properties
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps, batches = video
         
         # Create video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        out = cv2.VideoWriter(
-            output_path,
-            fourcc,
-            fps,
-            (TARGET_WIDTH, TARGET_HEIGHT)
-        )
+        out = create_writer(output_path, fps)
         
         frame_count = 0
         start_time = time.time()
+        in_flight = deque()
         
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Process frame
-            frame_data = detector.process_frame(frame)
-            visualized = visualize_results(frame_data)
+        def write_frame(frame_data):
+            nonlocal frame_count
+            visualized = visualizer.visualize_results(frame_data)
             out.write(visualized)
             
             frame_count += 1
@@ -57,61 +117,30 @@ def process_and_save(detector, input_path, output_path):
                 elapsed = time.time() - start_time
                 print(f"Processed {frame_count} frames ({frame_count/elapsed:.1f} fps)")
         
-        cap.release()
+        # A single writer thread draws and encodes in order while the
+        # main thread decodes and runs inference on the next batch
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for frames in batches:
+                # Process each decoded batch in one inference call
+                for frame_data in detector.process_frames(frames):
+                    in_flight.append(writer.submit(write_frame, frame_data))
+                
+                # Keep at most one batch queued behind the writer
+                while len(in_flight) > BATCH_SIZE:
+                    in_flight.popleft().result()
+            
+            # Surface any writer errors before releasing the output
+            for future in in_flight:
+                future.result()
+        
         out.release()
         return True
     
     return False
 
-def visualize_results(frame_data):
-    """Draw detection results on the frame with enhanced visualization"""
-    frame = frame_data['frame'].copy()
-    
-    # Draw PPE items first
-    for item in frame_data['ppe_items']:
-        box = [int(x) for x in item['box']]
-        color = COLORS.get(item['class'], (0, 255, 0))  # Default to green
-        cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), color, 2)
-        cv2.putText(frame, 
-                   f"{item['class']} {item['confidence']:.2f}", 
-                   (box[0], box[1] - 10), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 
-                   0.5, color, 1)
-    
-    # Draw persons and their scores
-    for person in frame_data['persons']:
-        box = [int(x) for x in person['box']]
-        pid = person['id']
-        score = frame_data['scores'].get(pid, 0)
-        
-        # Determine compliance color
-        compliance_color = COLORS['compliant'] if score >= COMPLIANCE_THRESHOLD else COLORS['non_compliant']
-        
-        # Draw person box
-        cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), COLORS['Person'], 2)
-        
-        # Draw info box
-        info_y = box[1] - 10 if box[1] > 30 else box[3] + 20
-        cv2.rectangle(frame, 
-                     (box[0] - 1, info_y - 20), 
-                     (box[0] + 200, info_y + 60), 
-                     compliance_color, -1)
-        cv2.putText(frame, f"ID: {pid}", (box[0], info_y), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        cv2.putText(frame, f"PPE: {score}%", (box[0], info_y + 20), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        
-        # List detected PPE items
-        if 'ppe_items' in person:
-            items_text = ", ".join(person['ppe_items']) if person['ppe_items'] else "None"
-            cv2.putText(frame, f"Items: {items_text}", (box[0], info_y + 40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-    
-    return frame
-
-
 def main():
     detector = PPEDetector()
+    visualizer = Visualizer()
     
     # Ensure output directory exists
     os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -133,7 +162,7 @@ def main():
         print(f"Processing {i}/{len(source_files)}: {filename}")
         start_time = time.time()
         
-        success = process_and_save(detector, input_path, output_path)
+        success = process_and_save(detector, visualizer, input_path, output_path)
         
         elapsed = time.time() - start_time
         status = "SUCCESS" if success else "FAILED"
@@ -1,93 +1,115 @@
 import cv2
 import time
+import queue
+import threading
 from src.core.detector import PPEDetector
+from src.utils.visualization import Visualizer
 from ..config.settings import (
-    TARGET_WIDTH, TARGET_HEIGHT, TARGET_FPS,
-    COMPLIANCE_THRESHOLD, COLORS
+    TARGET_WIDTH, TARGET_HEIGHT, TARGET_FPS
 )
 
-def visualize_results(frame_data):
-    """Draw detection results on the frame with enhanced visualization"""
-    frame = frame_data['frame'].copy()
-    
-    # Draw PPE items first
-    for item in frame_data['ppe_items']:
-        box = [int(x) for x in item['box']]
-        color = COLORS.get(item['class'], (0, 255, 0))  # Default to green
-        cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), color, 2)
-        cv2.putText(frame, 
-                   f"{item['class']} {item['confidence']:.2f}", 
-                   (box[0], box[1] - 10), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 
-                   0.5, color, 1)
-    
-    # Draw persons and their scores
-    for person in frame_data['persons']:
-        box = [int(x) for x in person['box']]
-        pid = person['id']
-        score = frame_data['scores'].get(pid, 0)
-        
-        # Determine compliance color
-        compliance_color = COLORS['compliant'] if score >= COMPLIANCE_THRESHOLD else COLORS['non_compliant']
-        
-        # Draw person box
-        cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), COLORS['Person'], 2)
-        
-        # Draw info box
-        info_y = box[1] - 10 if box[1] > 30 else box[3] + 20
-        cv2.rectangle(frame, 
-                     (box[0] - 1, info_y - 20), 
-                     (box[0] + 200, info_y + 60), 
-                     compliance_color, -1)
-        cv2.putText(frame, f"ID: {pid}", (box[0], info_y), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        cv2.putText(frame, f"PPE: {score}%", (box[0], info_y + 20), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
-        
-        # List detected PPE items
-        if 'ppe_items' in person:
-            items_text = ", ".join(person['ppe_items']) if person['ppe_items'] else "None"
-            cv2.putText(frame, f"Items: {items_text}", (box[0], info_y + 40), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
-    
-    return frame
+GRAB_WAIT = 0.005  # Seconds; a grab slower than this waited for a new frame
+
+def grab_latest(cap, stop):
+    """Skip frames the driver has buffered and decode only the newest one"""
+    # Never drain more than the driver can hold, whatever rate the camera runs at
+    max_grabs = max(int(cap.get(cv2.CAP_PROP_BUFFERSIZE)), 1) + 1
+    for _ in range(max_grabs):
+        if stop.is_set():
+            return False, None
+        start_time = time.monotonic()
+        if not cap.grab():
+            return False, None
+        # A grab that had to wait for the camera returned a fresh frame
+        if time.monotonic() - start_time > GRAB_WAIT:
+            break
+    return cap.retrieve()
+
+def put_latest(results, item):
+    """Queue an item, dropping the oldest one instead of blocking when full"""
+    while True:
+        try:
+            results.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                results.get_nowait()
+            except queue.Empty:
+                pass
+
+def detect_loop(cap, detector, results, stop, errors):
+    """Producer: capture and run detection, handing results to the display loop"""
+    try:
+        while not stop.is_set():
+            ret, frame = grab_latest(cap, stop)
+            if not ret:
+                break
+            
+            # Process frame
+            put_latest(results, detector.process_frame(frame))
+    except Exception as e:
+        # Re-raised by the display loop once the camera is released
+        errors.append(e)
+    finally:
+        put_latest(results, None)
 
 def main():
     detector = PPEDetector()
+    visualizer = Visualizer()
     cap = cv2.VideoCapture(0)
     
     # Set camera properties
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, TARGET_WIDTH)
     cap.set(cv2.CAP_PROP_FRAME_HEIGHT, TARGET_HEIGHT)
     cap.set(cv2.CAP_PROP_FPS, TARGET_FPS)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
     
     frame_time = 1.0 / TARGET_FPS
     
+    # Detection runs on a worker thread; drawing and the GUI stay on the
+    # main thread since OpenCV windows must be driven from it
+    results = queue.Queue(maxsize=4)
+    stop = threading.Event()
+    errors = []
+    worker = threading.Thread(
+        target=detect_loop, args=(cap, detector, results, stop, errors), daemon=True
+    )
+    worker.start()
+    
     try:
         while True:
-            start_time = time.time()
-            ret, frame = cap.read()
-            if not ret:
+            deadline = time.monotonic() + frame_time
+            try:
+                frame_data = results.get(timeout=0.5)
+            except queue.Empty:
+                if not worker.is_alive():
+                    break
+                # Keep the window responsive while detection catches up
+                if cv2.waitKey(1) == ord('q'):
+                    break
+                continue
+            if frame_data is None:
                 break
             
-            # Process frame
-            frame_data = detector.process_frame(frame)
-            visualized = visualize_results(frame_data)
+            visualized = visualizer.visualize_results(frame_data)
             
             # Show results
             cv2.imshow("PPE Compliance Monitor", visualized)
             
-            # Control frame rate
-            elapsed = time.time() - start_time
-            if elapsed < frame_time:
-                time.sleep(frame_time - elapsed)
-            
-            if cv2.waitKey(1) == ord('q'):
+            # Control frame rate: waitKey waits out the rest of the frame
+            # budget while pumping GUI events
+            wait_ms = max(1, int((deadline - time.monotonic()) * 1000))
+            if cv2.waitKey(wait_ms) == ord('q'):
                 break
                 
     finally:
+        stop.set()
+        worker.join()
         cap.release()
         cv2.destroyAllWindows()
+    
+    if errors:
+        raise errors[0]
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import cv2
+import numpy as np
+from ..config.settings import (
+    TARGET_WIDTH, TARGET_HEIGHT,
+    COMPLIANCE_THRESHOLD, COLORS, USE_OPENCL
+)
+
+# SIMD-optimized code paths on all cores, plus OpenCL (UMat) when available
+cv2.setUseOptimized(True)
+cv2.setNumThreads(os.cpu_count())
+cv2.ocl.setUseOpenCL(USE_OPENCL)
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+TEXT_COLOR = (255, 255, 255)
+LABEL_CACHE_SIZE = 1024  # Max cached labels besides the pre-baked scores
+LABEL_PAD = 2  # Margin for glyph strokes that overhang the reported text size
+
+def render_label(text, scale, color):
+    """Rasterize text once into a sprite, its coverage mask and the origin offset"""
+    (width, height), baseline = cv2.getTextSize(text, FONT, scale, 1)
+    origin = (LABEL_PAD, height + LABEL_PAD)
+    mask = np.zeros((height + baseline + 2 * LABEL_PAD, width + 2 * LABEL_PAD), dtype=np.uint8)
+    cv2.putText(mask, text, origin, FONT, scale, 255, 1)
+    
+    sprite = np.zeros(mask.shape + (3,), dtype=np.uint8)
+    sprite[:] = color
+    if np.isin(mask, (0, 255)).all():
+        return sprite, mask.astype(bool)[..., None], origin
+    # Anti-aliased glyphs (newer OpenCV builds) keep their coverage for blending
+    return sprite, mask.astype(np.float32)[..., None] / 255, origin
+
+def resize_to_target(frame, dst):
+    """Resize a frame to target resolution into dst (a new array on the OpenCL path)"""
+    height, width = frame.shape[:2]
+    if (width, height) == (TARGET_WIDTH, TARGET_HEIGHT):
+        np.copyto(dst, frame)
+        return dst
+    
+    size = (TARGET_WIDTH, TARGET_HEIGHT)
+    # INTER_AREA has vectorized downscaling paths and avoids aliasing
+    interpolation = cv2.INTER_AREA if width > TARGET_WIDTH or height > TARGET_HEIGHT else cv2.INTER_LINEAR
+    if cv2.ocl.useOpenCL():
+        # The device result can only be downloaded into a fresh array
+        return cv2.resize(cv2.UMat(frame), size, interpolation=interpolation).get()
+    cv2.resize(frame, size, dst=dst, interpolation=interpolation)
+    return dst
+
+class Visualizer:
+    """Draws detection results, blitting cached text sprites instead of calling cv2.putText"""
+    
+    def __init__(self):
+        self._label_cache = {}
+        # Reused output frame; callers must consume it before the next call
+        self._vis_buf = None
+        # Every possible score label, baked up front
+        self._score_labels = [
+            render_label(f"PPE: {score}%", 0.6, TEXT_COLOR) for score in range(101)
+        ]
+    
+    def get_label(self, text, scale, color):
+        key = (text, scale, color)
+        label = self._label_cache.get(key)
+        if label is None:
+            if len(self._label_cache) >= LABEL_CACHE_SIZE:
+                # Evict the oldest entry (dicts keep insertion order)
+                del self._label_cache[next(iter(self._label_cache))]
+            label = self._label_cache[key] = render_label(text, scale, color)
+        return label
+    
+    def put_label(self, frame, label, org):
+        """Blit a label so its text baseline starts at org, like cv2.putText"""
+        sprite, mask, (ox, oy) = label
+        x, y = org[0] - ox, org[1] - oy
+        h, w = mask.shape[:2]
+        
+        # Clip to the frame
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame.shape[1]), min(y + h, frame.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        
+        roi = frame[y0:y1, x0:x1]
+        src = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        if mask.dtype == bool:
+            np.copyto(roi, sprite[src], where=mask[src])
+        else:
+            roi[:] = roi + mask[src] * (sprite[src].astype(np.float32) - roi) + 0.5
+    
+    def visualize_results(self, frame_data):
+        """Draw detection results on the frame with enhanced visualization"""
+        if self._vis_buf is None:
+            self._vis_buf = np.empty((TARGET_HEIGHT, TARGET_WIDTH, 3), dtype=np.uint8)
+        
+        # Frames arrive at source resolution; boxes are already in target coordinates
+        frame = resize_to_target(frame_data['frame'], self._vis_buf)
+        
+        # Draw PPE items first
+        names = frame_data['names']
+        for box, cls, conf in zip(frame_data['ppe_boxes'].astype(int).tolist(),
+                                  frame_data['ppe_classes'],
+                                  frame_data['ppe_confidences']):
+            name = names[cls]
+            color = COLORS.get(name, (0, 255, 0))  # Default to green
+            cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), color, 2)
+            self.put_label(frame, self.get_label(f"{name} {conf:.2f}", 0.5, color),
+                           (box[0], box[1] - 10))
+        
+        # Draw persons and their scores
+        for box, pid, score in zip(frame_data['person_boxes'].astype(int).tolist(),
+                                   frame_data['person_ids'],
+                                   frame_data['scores']):
+            # Determine compliance color
+            compliance_color = COLORS['compliant'] if score >= COMPLIANCE_THRESHOLD else COLORS['non_compliant']
+            
+            # Draw person box
+            cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), COLORS['Person'], 2)
+            
+            # Draw info box
+            info_y = box[1] - 10 if box[1] > 30 else box[3] + 20
+            cv2.rectangle(frame,
+                         (box[0] - 1, info_y - 20),
+                         (box[0] + 200, info_y + 60),
+                         compliance_color, -1)
+            self.put_label(frame, self.get_label(f"ID: {pid}", 0.6, TEXT_COLOR),
+                           (box[0], info_y))
+            self.put_label(frame, self._score_labels[score], (box[0], info_y + 20))
+        
+        return frame